@@ -1,7 +1,8 @@
+from googleapi.cache import ReadCache, SnapshotCache
 from googleapi.client import Client
 from googleapi.spreadsheet import SpreadSheet
 
-__all__ = ['Client', 'SpreadSheet']
+__all__ = ['Client', 'ReadCache', 'SnapshotCache', 'SpreadSheet']
 
 from ._version import get_versions
 __version__ = get_versions()['version']
@@ -0,0 +1,220 @@
+import json
+import googleapi.serialize
+
+# Approximate limit on the size of a batchUpdate body
+MAX_BYTES = 8 * 2**20
+
+# Requests that only write cells or properties, without reading any state
+# or moving cells. Any other request, such as copyPaste, sortRange or
+# insertDimension, depends on the requests before it
+_WRITES = {
+    'repeatCell', 'updateCells', 'updateBorders', 'updateSheetProperties',
+    'updateDimensionProperties', 'updateSpreadsheetProperties',
+}
+
+# Requests that set the same state every time they are applied
+_IDEMPOTENT = {
+    'repeatCell', 'updateCells', 'updateSheetProperties',
+    'updateDimensionProperties', 'updateSpreadsheetProperties',
+}
+
+
+def optimize(requests, max_bytes=MAX_BYTES):
+    """Optimize the requests of a batchUpdate and split them into bodies of
+    at most max_bytes, keeping their order.
+
+    Between requests that read cells or move them, such as copyPaste or
+    insertDimension: repeated identical requests are only sent last,
+    updateSheetProperties of the same sheet are merged and repeatCell or
+    updateDimensionProperties entirely overwritten by a later one are
+    dropped. Requests encoded as googleapi.serialize.Raw are
+    sent as they are.
+
+    Returns the bodies, and for each of them the index of its requests in
+    the original list, to map the replies back.
+    """
+    kept = []
+    segment = []
+    for i, request in enumerate(requests):
+        if not _writes(request) or _resizes(request):
+            kept += _optimize_segment(segment) + [(i, request)]
+            segment = []
+        else:
+            segment += [(i, request)]
+    kept += _optimize_segment(segment)
+
+    bodies, indexes = [], []
+    size = 0
+    for i, request in kept:
+        length = len(_dumps(request)) + 1
+        if not bodies or size + length > max_bytes:
+            bodies += [[]]
+            indexes += [[]]
+            size = 0
+        bodies[-1] += [request]
+        indexes[-1] += [i]
+        size += length
+
+    return bodies, indexes
+
+
+def _kind(request):
+    """Return the type of a request."""
+    if isinstance(request, googleapi.serialize.Raw):
+        return None
+    return next(iter(request), None)
+
+
+def _dumps(request):
+    """Return the JSON of a request."""
+    if isinstance(request, googleapi.serialize.Raw):
+        return request
+    return json.dumps(request)
+
+
+def _writes(request):
+    """Whether a request only writes cells or properties. Requests encoded
+    as googleapi.serialize.Raw are updateCells.
+    """
+    if isinstance(request, googleapi.serialize.Raw):
+        return True
+    return _kind(request) in _WRITES
+
+
+def _resizes(request):
+    """Whether a request changes the size of a grid."""
+    if _kind(request) != 'updateSheetProperties':
+        return False
+
+    fields = request['updateSheetProperties'].get('fields', '*')
+    resizes = {'*', 'gridProperties', 'gridProperties.*',
+               'gridProperties.rowCount', 'gridProperties.columnCount'}
+    return any(_ in resizes for _ in _paths(fields))
+
+
+def _optimize_segment(segment):
+    """Optimize requests that only write cells or properties."""
+    # Identical requests are only kept last
+    last = {}
+    for i, request in segment:
+        if _kind(request) in _IDEMPOTENT:
+            last[_dumps(request)] = i
+    segment = [
+        (i, r) for i, r in segment
+        if _kind(r) not in _IDEMPOTENT or last[_dumps(r)] == i]
+
+    # Sheet properties are merged into the last update of each sheet
+    merged = {}
+    for i, request in segment:
+        if _kind(request) == 'updateSheetProperties':
+            update = request['updateSheetProperties']
+            sheetId = update['properties'].get('sheetId')
+            if sheetId in merged:
+                previous = merged[sheetId]['updateSheetProperties']
+                update = {
+                    'properties': _merge(
+                        previous['properties'], update['properties']),
+                    'fields': _merge_fields(
+                        previous['fields'], update['fields']),
+                }
+            merged[sheetId] = {'updateSheetProperties': update}
+
+    result = []
+    seen = set()
+    later = {}
+    for i, request in reversed(segment):
+        kind = _kind(request)
+        if kind == 'updateSheetProperties':
+            sheetId = request[kind]['properties'].get('sheetId')
+            if sheetId in seen:
+                continue
+            seen.add(sheetId)
+            request = merged[sheetId]
+        elif kind in ('repeatCell', 'updateDimensionProperties'):
+            key = (kind, request[kind]['range'].get('sheetId'))
+            if any(_overwrites(_, request) for _ in later.get(key, [])):
+                continue
+            later.setdefault(key, []).append(request)
+        result += [(i, request)]
+
+    return result[::-1]
+
+
+def _merge(a, b):
+    """Deep merge two dicts, with the values of b taking precedence."""
+    merged = dict(a)
+    for k, v in b.items():
+        if isinstance(v, dict) and isinstance(merged.get(k), dict):
+            v = _merge(merged[k], v)
+        merged[k] = v
+
+    return merged
+
+
+def _merge_fields(a, b):
+    """Merge two field masks into one of dotted paths, leaving out the
+    paths already covered by another.
+    """
+    paths = set(_paths(a)) | set(_paths(b))
+    if '*' in paths:
+        return '*'
+
+    paths = [
+        p for p in paths
+        if not any(p.startswith(_ + '.') for _ in paths)]
+    return ','.join(sorted(paths))
+
+
+def _overwrites(later, earlier):
+    """Whether a later request sets every field an earlier one sets, over
+    its whole range.
+    """
+    kind = _kind(earlier)
+    if _kind(later) != kind:
+        return False
+
+    ranges = later[kind]['range'], earlier[kind]['range']
+    if kind == 'repeatCell':
+        keys = [('startRowIndex', 'endRowIndex'),
+                ('startColumnIndex', 'endColumnIndex')]
+    elif ranges[0].get('dimension') != ranges[1].get('dimension'):
+        return False
+    else:
+        keys = [('startIndex', 'endIndex')]
+
+    if ranges[0].get('sheetId') != ranges[1].get('sheetId'):
+        return False
+    for start, end in keys:
+        if ranges[0].get(start, 0) > ranges[1].get(start, 0):
+            return False
+        if ranges[0].get(end, float('inf')) < \
+                ranges[1].get(end, float('inf')):
+            return False
+
+    fields = _paths(later[kind]['fields'])
+    if '*' in fields:
+        return True
+
+    return all(
+        any(p == f or p.startswith(f + '.') for f in fields)
+        for p in _paths(earlier[kind]['fields']))
+
+
+def _paths(fields):
+    """Expand a field mask such as 'a(b,c),d' into paths a.b, a.c and d."""
+    paths = []
+    stack = []
+    token = ''
+    for char in fields + ',':
+        if char in ',()':
+            if token.strip():
+                paths += ['.'.join(stack[-1:] + [token.strip()])]
+            if char == '(':
+                stack += [paths.pop()]
+            elif char == ')':
+                stack.pop()
+            token = ''
+        else:
+            token += char
+
+    return paths
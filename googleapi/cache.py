@@ -0,0 +1,242 @@
+import collections
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+import numpy as np
+import pandas as pd
+import googleapi.spreadsheet
+
+try:
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Inferred types of object columns that Parquet cannot store
+_MIXED = {'mixed', 'mixed-integer', 'mixed-integer-float'}
+
+
+class ReadCache():
+    """A least recently used cache of the DataRange objects returned by
+    reads, validated against the Drive version of their spreadsheet.
+    """
+
+    def __init__(self, ttl=5, max_entries=128, max_bytes=256 * 2**20):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self._entries = collections.OrderedDict()
+        self._versions = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        """Memory used by the cached data, in bytes."""
+        return self._bytes
+
+    def version(self, client, spreadsheetId):
+        """Return the Drive version of a spreadsheet. The version is only
+        requested again once it is older than the ttl, in seconds.
+        """
+        version, checked = self._versions.get(spreadsheetId, (None, None))
+        if checked is not None and time.monotonic() - checked < self.ttl:
+            return version
+
+        request = client.api['drive'].files().get(
+            fileId=spreadsheetId, fields='version,modifiedTime')
+        response = client._execute_requests(request)
+
+        version = (response.get('version'), response.get('modifiedTime'))
+        self._versions[spreadsheetId] = (version, time.monotonic())
+
+        return version
+
+    def get(self, key, version):
+        """Return the cached data for a key and version, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] != version:
+                self._pop(key)
+                return None
+
+            self._entries.move_to_end(key)
+
+        return entry[1]
+
+    def put(self, key, version, data):
+        """Cache the data read for a key at a version, evicting the least
+        recently used entries beyond the size limits.
+        """
+        size = int(data.data.memory_usage(deep=True).sum())
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._pop(key)
+
+            self._entries[key] = (version, data, size)
+            self._bytes += size
+
+            while (len(self._entries) > self.max_entries
+                   or self._bytes > self.max_bytes):
+                self._pop(next(iter(self._entries)))
+
+    def invalidate(self, spreadsheetId):
+        """Forget the version of a spreadsheet after it is written to, so
+        that it is checked again on the next read.
+        """
+        self._versions.pop(spreadsheetId, None)
+
+    def clear(self):
+        """Remove all cached data."""
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self._bytes = 0
+
+    def _pop(self, key):
+        """Remove an entry from the cache."""
+        entry = self._entries.pop(key)
+        self._bytes -= entry[2]
+
+
+class SnapshotCache(ReadCache):
+    """A ReadCache that also keeps a snapshot of each range on disk, so it
+    is shared between processes. Snapshots are stored as Parquet when
+    pyarrow is installed and as one .npy file per column otherwise, and
+    are memory mapped when loaded. Columns without a numpy dtype are
+    pickled, and so are all the columns of a range with a column mixing
+    types, which Parquet cannot store.
+    """
+
+    def __init__(self, path=None, parquet=None, **kwargs):
+        super().__init__(**kwargs)
+
+        if path is None:
+            path = os.getenv('GOOGLE_CACHE_PATH')
+        if path is None:
+            raise ValueError(
+                'Specify the path of the cache or set GOOGLE_CACHE_PATH')
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+
+        if parquet is None:
+            parquet = pyarrow is not None
+        self.parquet = parquet
+
+    def get(self, key, version):
+        """Return the cached data for a key and version from memory or
+        disk, or None.
+        """
+        data = super().get(key, version)
+        if data is not None:
+            return data
+
+        folder = self._folder(key)
+        try:
+            with open(os.path.join(folder, 'meta.json'), 'r') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta['version'] != list(version):
+            return None
+
+        if meta['format'] == 'parquet':
+            frame = pd.read_parquet(
+                os.path.join(folder, 'data.parquet'), memory_map=True)
+        else:
+            columns = []
+            for i, (name, kind) in enumerate(meta['columns']):
+                path = os.path.join(folder, f'{i}.{kind}')
+                if kind == 'npy':
+                    column = pd.Series(
+                        np.load(path, mmap_mode='c'), name=name, copy=False)
+                else:
+                    with open(path, 'rb') as f:
+                        column = pickle.load(f)
+                columns += [column]
+            frame = pd.concat(columns, axis=1, copy=False)
+            if not columns:
+                frame = pd.DataFrame()
+
+        data = googleapi.spreadsheet.DataRange(
+            meta['response'], frame, sheetId=meta['sheetId'],
+            columns=meta['columns_index'], infer=False)
+        super().put(key, version, data)
+
+        return data
+
+    def put(self, key, version, data):
+        """Cache the data read for a key at a version in memory and on
+        disk.
+        """
+        super().put(key, version, data)
+
+        # Columns mixing types are pickled, as Parquet cannot store them
+        frame = data.data
+        parquet = self.parquet and not any(
+            _.dtype == object and pd.api.types.infer_dtype(_) in _MIXED
+            for _ in (frame.iloc[:, i] for i in range(frame.shape[1])))
+
+        meta = {
+            'version': list(version),
+            'format': 'parquet' if parquet else 'npy',
+            'response': {
+                'spreadsheetId': data.spreadsheetId,
+                'range': data._range,
+            },
+            'sheetId': data.sheetId,
+            'columns_index': data._columns,
+            'columns': [],
+        }
+
+        folder = self._folder(key)
+        temp = tempfile.mkdtemp(dir=self.path)
+        try:
+            if parquet:
+                frame.to_parquet(os.path.join(temp, 'data.parquet'))
+            else:
+                for i, name in enumerate(frame.columns):
+                    column = frame.iloc[:, i]
+                    if isinstance(column.dtype, np.dtype) and \
+                            column.dtype.kind in 'biufcmM':
+                        kind = 'npy'
+                        np.save(os.path.join(temp, f'{i}.npy'), column.values)
+                    else:
+                        kind = 'pkl'
+                        with open(os.path.join(temp, f'{i}.pkl'), 'wb') as f:
+                            pickle.dump(column, f, pickle.HIGHEST_PROTOCOL)
+                    meta['columns'] += [[name, kind]]
+
+            with open(os.path.join(temp, 'meta.json'), 'w') as f:
+                json.dump(meta, f)
+
+            # Another process may write the same key at the same time, in
+            # which case its snapshot is kept
+            shutil.rmtree(folder, ignore_errors=True)
+            try:
+                os.replace(temp, folder)
+            except OSError:
+                pass
+        finally:
+            shutil.rmtree(temp, ignore_errors=True)
+
+    def clear(self):
+        """Remove all cached data, including the snapshots on disk."""
+        super().clear()
+        for name in os.listdir(self.path):
+            shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+    def _folder(self, key):
+        """Return the folder holding the snapshot of a key."""
+        name = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self.path, name)
@@ -2,6 +2,8 @@ import time
 import json
 import os
 from googleapiclient.discovery import build
+import httplib2
+import google_auth_httplib2
 import google.auth.transport.requests
 import google.oauth2.credentials
 import googleapiclient.errors
@@ -11,8 +13,9 @@ import googleapi.spreadsheet
 class Client():
     """Create a connection to a Google drive API."""
 
-    def __init__(self, token_path=None):
+    def __init__(self, token_path=None, cache=None):
         self.current_uid = None
+        self.cache = cache
         self.sheets = {}
         self.files = {'sheets': [], 'folders': []}
 
@@ -33,6 +36,8 @@ class Client():
 
             self._build_api(token)
 
+        self._token = token
+
     def _build_api(self, token):
         """Connect to drive and sheets API"""
         api = {}
@@ -102,14 +107,40 @@ class Client():
             removeParents=previous_parents,
             fields='id, parents').execute()
 
-    def _execute_requests(self, request):
+    def _modified(self, spreadsheetId):
+        """Invalidate the cached reads of a spreadsheet after a write."""
+        if self.cache is not None:
+            self.cache.invalidate(spreadsheetId)
+
+    def _http(self):
+        """Return a new authorized HTTP connection. httplib2 is not thread
+        safe, so requests executed from another thread need their own.
+        """
+        if self._token is None:
+            return None
+
+        return google_auth_httplib2.AuthorizedHttp(
+            self._token, http=httplib2.Http())
+
+    def _set_body(self, request, body):
+        """Replace the body of a request with JSON that is already encoded.
+        The request was built with a placeholder body, so its size and
+        content-length header are updated to match.
+        """
+        request.body = body
+        request.body_size = len(body.encode('utf-8'))
+        request.headers['content-length'] = str(request.body_size)
+
+        return request
+
+    def _execute_requests(self, request, http=None):
         """Execute a request to the Google Sheets API v4."""
         try:
-            response = request.execute(num_retries=3)
+            response = request.execute(http=http, num_retries=3)
         except googleapiclient.errors.HttpError as error:
             if error.resp['status'] == '429':
                 time.sleep(10)
-                response = request.execute(num_retries=3)
+                response = request.execute(http=http, num_retries=3)
             else:
                 raise
 
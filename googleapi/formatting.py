@@ -0,0 +1,261 @@
+import itertools
+import json
+import numpy as np
+
+
+# Approximate widths in pixels of Arial 10, the default font of Sheets
+_CHAR_WIDTHS = {
+    **dict.fromkeys("'|", 2),
+    **dict.fromkeys('ijl.,:;!', 3),
+    **dict.fromkeys('frtI[]()-/ ', 4),
+    **dict.fromkeys('abcdeghknopqsuvxyzJ0123456789$#*?_', 7),
+    **dict.fromkeys('ABEFKPSTVXYZL', 8),
+    **dict.fromkeys('CDGHNORUw&%', 9),
+    **dict.fromkeys('mM', 10),
+    **dict.fromkeys('W@', 12),
+}
+
+
+def column_widths(data, padding=12, minimum=40, maximum=500, sample=20):
+    """Estimate the pixel width of each column of a DataFrame as written by
+    set_values, with the column names as a bold first row. The longest
+    values of each column are measured with a table of character widths.
+    """
+    widths = []
+    for i in range(data.shape[1]):
+        values = data.iloc[:, i]
+        values = values[values.notna()].astype(str)
+
+        lengths = values.str.len().to_numpy()
+        longest = values.to_numpy()[np.argsort(lengths)[-sample:]]
+
+        width = 1.1 * _text_width(str(data.columns[i]))
+        for text in longest:
+            width = max(width, _text_width(text))
+
+        widths += [int(min(max(width + padding, minimum), maximum))]
+
+    return widths
+
+
+def _text_width(text):
+    """Return the approximate width of a string in pixels."""
+    return sum(_CHAR_WIDTHS.get(_, 7) for _ in text)
+
+
+def width_requests(widths, start=0):
+    """Return the updateDimensionProperties requests setting the pixel
+    widths of consecutive columns from the start column, with one request
+    per run of equal widths. The sheetId is left to Sheet.update.
+    """
+    request = []
+    for width, group in itertools.groupby(enumerate(widths), lambda _: _[1]):
+        group = list(group)
+        request += [{
+            'updateDimensionProperties': {
+                'range': {
+                    'dimension': 'COLUMNS',
+                    'startIndex': start + group[0][0],
+                    'endIndex': start + group[-1][0] + 1,
+                },
+                'properties': {'pixelSize': width},
+                'fields': 'pixelSize',
+            }
+        }]
+
+    return request
+
+
+def style_grid(data, columns=None, rows=None, header=None):
+    """Return the CellFormat of each cell of a DataFrame as written by
+    set_values, with the column names as the first row. The header format
+    applies to the first row, and the rows formats are repeated over the
+    data rows, e.g. two formats for banding. The formats of columns, by
+    name, are merged over those of the rows. Unstyled cells are None.
+    """
+    nrows, ncols = data.shape[0] + 1, data.shape[1]
+    styles = np.full((nrows, ncols), None, dtype=object)
+
+    if rows:
+        for i, fmt in enumerate(rows):
+            styles[1 + i::len(rows)] = [fmt]
+
+    if columns:
+        for name, fmt in columns.items():
+            j = data.columns.get_loc(name)
+            merged = {None: fmt}
+            for _ in rows or []:
+                merged[id(_)] = {**_, **fmt}
+            styles[1:, j] = [
+                merged[None if _ is None else id(_)] for _ in styles[1:, j]]
+
+    if header:
+        styles[0] = [header]
+
+    return styles
+
+
+def compile_formats(styles, start=(0, 0), chunk_rows=5000, min_rects=4):
+    """Compile a 2-D grid of CellFormat, or None to leave a cell as it is,
+    into the fewest repeatCell and updateCells requests.
+
+    Cells with the same format are merged into rectangles, each sent as a
+    repeatCell. Where at least min_rects rectangles of the same columns
+    and formats setting the same fields follow each other down the rows,
+    as with banding, the cells are instead formatted one by one with
+    updateCells, together with neighbouring columns over the same rows
+    and fields, in requests of at most chunk_rows rows. Empty formats are
+    left as they are, like None. The sheetId of the requests is left to
+    Sheet.update.
+    """
+    styles = np.asarray(styles, dtype=object)
+    if styles.ndim != 2 or not styles.size:
+        return []
+
+    # Number the distinct formats, with 0 for unstyled cells. Cells often
+    # share the same dict, which is then only encoded once.
+    keys, seen = {}, {}
+    formats = [None]
+    ids = np.zeros(styles.shape, dtype=np.int64)
+    for index, fmt in np.ndenumerate(styles):
+        if not fmt:
+            continue
+        if id(fmt) not in seen:
+            key = json.dumps(fmt, sort_keys=True)
+            if key not in keys:
+                keys[key] = len(formats)
+                formats += [fmt]
+            seen[id(fmt)] = keys[key]
+        ids[index] = seen[id(fmt)]
+
+    rects = _rectangles(ids)
+
+    # A dense block sets the same fields on all its cells, so it only
+    # holds formats with the same keys, which a repeatCell would also set
+    keys = [None] + [tuple(sorted(_)) for _ in formats[1:]]
+
+    spans = {}
+    for rect in sorted(rects, key=lambda _: (_[2], _[3], _[0])):
+        spans.setdefault((rect[2], rect[3]), []).append(rect)
+
+    request, dense = [], []
+    for (c0, c1), group in spans.items():
+        chain = [group[0]]
+        for rect in group[1:] + [None]:
+            if rect is not None and rect[0] == chain[-1][1] \
+                    and keys[rect[4]] == keys[chain[-1][4]]:
+                chain += [rect]
+                continue
+
+            if len(chain) >= min_rects:
+                dense += [(chain[0][0], chain[-1][1], c0, c1,
+                           keys[chain[0][4]])]
+            else:
+                request += [_repeat_cell(_, formats, start) for _ in chain]
+            chain = [rect]
+
+    # Dense blocks over the same rows, adjacent columns and the same
+    # fields are sent together
+    blocks = []
+    for r0, r1, c0, c1, k in sorted(dense):
+        if blocks and blocks[-1][:2] == [r0, r1] and blocks[-1][3] == c0 \
+                and blocks[-1][4] == k:
+            blocks[-1][3] = c1
+        else:
+            blocks += [[r0, r1, c0, c1, k]]
+
+    for block in blocks:
+        request += _update_cells(ids, formats, block[:4], start, chunk_rows)
+
+    return request
+
+
+def _rectangles(ids):
+    """Merge equal, non-zero ids into rectangles of (row start, row end,
+    column start, column end, id), with exclusive ends.
+    """
+    rows = [tuple(_) for _ in ids.tolist()]
+
+    # The runs of each distinct row are only found once
+    runs = {}
+    for row in set(rows):
+        runs[row], c0 = [], 0
+        for i, group in itertools.groupby(row):
+            c1 = c0 + len(list(group))
+            if i:
+                runs[row] += [(c0, c1, i)]
+            c0 = c1
+
+    # Identical consecutive rows are handled as a single block
+    open_ = {}
+    rects = []
+    r0 = 0
+    for r1 in range(1, len(rows) + 1):
+        if r1 < len(rows) and rows[r1] == rows[r0]:
+            continue
+
+        current = {}
+        for run in runs[rows[r0]]:
+            r = open_.pop(run, [r0, r1])
+            r[1] = r1
+            current[run] = r
+
+        rects += [(r[0], r[1], *run) for run, r in open_.items()]
+        open_ = current
+        r0 = r1
+
+    rects += [(r[0], r[1], *run) for run, r in open_.items()]
+
+    return rects
+
+
+def _fields(formats):
+    """Return the field mask for the keys of some CellFormats."""
+    keys = sorted(set().union(*formats))
+    return f'userEnteredFormat({",".join(keys)})'
+
+
+def _repeat_cell(rect, formats, start):
+    """Return the repeatCell request of a rectangle."""
+    r0, r1, c0, c1, i = rect
+    request = {
+        'repeatCell': {
+            'range': {
+                'startRowIndex': start[0] + r0,
+                'endRowIndex': start[0] + r1,
+                'startColumnIndex': start[1] + c0,
+                'endColumnIndex': start[1] + c1,
+            },
+            'cell': {'userEnteredFormat': formats[i]},
+            'fields': _fields([formats[i]]),
+        }
+    }
+
+    return request
+
+
+def _update_cells(ids, formats, block, start, chunk_rows=5000):
+    """Return the updateCells requests setting the format of every cell of
+    a block of (row start, row end, column start, column end).
+    """
+    r0, r1, c0, c1 = block
+    ids = ids[r0:r1, c0:c1]
+    fields = _fields([formats[_] for _ in np.unique(ids)])
+
+    cells = [{'userEnteredFormat': _} for _ in formats]
+    rows = [{'values': [cells[_] for _ in row]} for row in ids.tolist()]
+
+    request = []
+    for i in range(0, len(rows), chunk_rows):
+        request += [{
+            'updateCells': {
+                'rows': rows[i:i + chunk_rows],
+                'start': {
+                    'rowIndex': start[0] + r0 + i,
+                    'columnIndex': start[1] + c0,
+                },
+                'fields': fields,
+            }
+        }]
+
+    return request
@@ -0,0 +1,150 @@
+import functools
+import re
+import numpy as np
+
+_CELL = re.compile(r'\$?([A-Za-z]{0,3})\$?(\d*)$')
+_LETTERS = np.array([chr(65 + _) for _ in range(26)], dtype=object)
+_KEYS = ['startRowIndex', 'endRowIndex', 'startColumnIndex', 'endColumnIndex']
+
+
+@functools.lru_cache(maxsize=4096)
+def col_to_name(col):
+    """Return the letters of a zero-indexed column, e.g. 27 is AB."""
+    name = ''
+    col += 1
+    while col:
+        col, rem = divmod(col - 1, 26)
+        name = chr(65 + rem) + name
+
+    return name
+
+
+@functools.lru_cache(maxsize=4096)
+def name_to_col(name):
+    """Return the zero-indexed column of some letters, e.g. AB is 27."""
+    col = 0
+    for char in name.upper():
+        col = col * 26 + ord(char) - 64
+
+    return col - 1
+
+
+def col_names(cols):
+    """Return the letters of an array of zero-indexed columns."""
+    cols = np.asarray(cols, dtype=np.int64) + 1
+    names = np.full(cols.shape, '', dtype=object)
+    while cols.any():
+        rem = (cols - 1) % 26
+        names = np.where(cols > 0, _LETTERS[rem] + names, names)
+        cols = np.maximum(cols - 1, 0) // 26
+
+    return names
+
+
+def rowcol_to_cell(row, col):
+    """Return the A1 notation of a zero-indexed cell."""
+    return f'{col_to_name(col)}{row + 1}'
+
+
+def quote(title):
+    """Quote a worksheet title for use in A1 notation. Titles that read as
+    cells, such as Jan or A1, are quoted too.
+    """
+    if re.match(r'[A-Za-z_][A-Za-z0-9_]*$', title) and not _CELL.match(title):
+        return title
+    return "'" + title.replace("'", "''") + "'"
+
+
+def split(a1):
+    """Split a range in A1 notation into its worksheet title, or None, and
+    its cells, or '' for a whole worksheet. Without a '!', a range that
+    is not valid cells, such as Sheet1, is taken as a worksheet title.
+    """
+    if a1.startswith("'"):
+        end = a1.rindex("'")
+        title = a1[1:end].replace("''", "'")
+        return title, a1[end + 2:]
+
+    if '!' in a1:
+        title, cells = a1.rsplit('!', 1)
+        return title, cells
+
+    if _CELL.match(a1.split(':')[0]) and _CELL.match(a1.split(':')[-1]):
+        return None, a1
+
+    return a1, ''
+
+
+@functools.lru_cache(maxsize=4096)
+def parse(a1):
+    """Parse a range in A1 notation, such as A1, A1:C10, A:C, 5:10, A5:C
+    or 'Sheet 1'!A1:C10, into (title, startRowIndex, endRowIndex,
+    startColumnIndex, endColumnIndex). Indexes are zero-indexed with
+    exclusive ends, as in a GridRange, and None where the range is
+    unbounded. The title is None when the range has none.
+    """
+    title, cells = split(a1)
+    indexes = [None] * 4
+    if cells:
+        first, last = (cells.split(':') + [cells])[:2]
+        for cell, offset in [(first, 0), (last, 1)]:
+            match = _CELL.match(cell)
+            if match is None:
+                raise ValueError(f'Invalid range {a1}')
+            col, row = match.groups()
+            if row:
+                indexes[offset] = int(row) - 1 + offset
+            if col:
+                indexes[2 + offset] = name_to_col(col) + offset
+
+    return (title, *indexes)
+
+
+def start(a1):
+    """Return the zero-indexed (row, col) of the top left cell of a range
+    in A1 notation.
+    """
+    _, row, _, col, _ = parse(a1)
+    return row or 0, col or 0
+
+
+def grid_range(a1, sheetId=None):
+    """Convert a range in A1 notation to a GridRange, leaving out the
+    unbounded sides. The sheetId is added when given.
+    """
+    result = {k: v for k, v in zip(_KEYS, parse(a1)[1:]) if v is not None}
+    if sheetId is not None:
+        result['sheetId'] = sheetId
+
+    return result
+
+
+def to_a1(grid_range, title=None):
+    """Convert a GridRange, or a tuple of (startRowIndex, endRowIndex,
+    startColumnIndex, endColumnIndex), to A1 notation, with the title of
+    its worksheet if given.
+    """
+    if isinstance(grid_range, dict):
+        grid_range = [grid_range.get(_) for _ in _KEYS]
+    r0, r1, c0, c1 = grid_range
+
+    first, last = '', ''
+    if c0 is not None or c1 is not None:
+        first += col_to_name(c0 or 0)
+        last += col_to_name(c1 - 1) if c1 is not None else ''
+    if r0 is not None or r1 is not None:
+        first += str((r0 or 0) + 1)
+        last += str(r1) if r1 is not None else ''
+
+    cells = first
+    if (r1, c1) != ((r0 or 0) + 1, (c0 or 0) + 1):
+        cells = f'{first}:{last}'
+    if not first:
+        cells = ''
+
+    if title is None:
+        return cells
+    if not cells:
+        return quote(title)
+
+    return f'{quote(title)}!{cells}'
@@ -0,0 +1,261 @@
+import datetime
+import itertools
+import json
+import numbers
+from json.encoder import encode_basestring_ascii as _string
+import numpy as np
+import pandas as pd
+
+EPOCH = np.datetime64('1899-12-30', 'ns')
+DAY = np.timedelta64(1, 'D')
+
+
+class Raw(str):
+    """A batchUpdate request that is already encoded as JSON."""
+
+
+def serial(values):
+    """Convert datetime64 or timedelta64 values to Sheets serial numbers.
+    NaT becomes NaN.
+    """
+    values = np.asarray(values)
+    if values.dtype.kind == 'M':
+        values = values.astype('datetime64[ns]') - EPOCH
+
+    return values / DAY
+
+
+def from_serial(values):
+    """Convert Sheets serial numbers to datetime64 values, to the nearest
+    microsecond. NaN becomes NaT.
+    """
+    days = np.asarray(values, dtype='float64')
+    empty = np.isnan(days)
+    us = np.round(np.where(empty, 0, days) * (DAY / np.timedelta64(1, 'us')))
+    values = EPOCH + us.astype('int64').astype('timedelta64[us]')
+    values[empty] = np.datetime64('NaT')
+
+    return values
+
+
+def encode_column(series):
+    """Encode a column as JSON tokens, one per cell, along with the
+    ExtendedValue kind of each cell. Empty cells have a kind of None.
+    """
+    dtype = series.dtype
+
+    if isinstance(dtype, pd.CategoricalDtype):
+        tokens, kinds = encode_column(pd.Series(dtype.categories))
+        codes = series.cat.codes.values
+        tokens = np.append(tokens, '""')[codes]
+        kinds = np.append(kinds, None)[codes]
+        return tokens, kinds
+
+    if isinstance(dtype, pd.DatetimeTZDtype):
+        series = series.dt.tz_localize(None)
+        dtype = series.dtype
+
+    if dtype.kind in 'mM':
+        return _numbers(serial(series.values))
+
+    if dtype.kind == 'b':
+        na = series.isna().values
+        values = series.fillna(False).values.astype(bool)
+        tokens = np.where(values, 'true', 'false').astype(object)
+        kinds = np.full(len(tokens), 'boolValue', dtype=object)
+        tokens[na], kinds[na] = '""', None
+        return tokens, kinds
+
+    if dtype.kind in 'iu' and not series.hasnans:
+        tokens = _array(map(str, series.values.tolist()), len(series))
+        return tokens, np.full(len(tokens), 'numberValue', dtype=object)
+
+    if dtype.kind in 'iuf':
+        return _numbers(series.to_numpy(dtype='float64', na_value=np.nan))
+
+    if pd.api.types.infer_dtype(series, skipna=False) == 'string':
+        tokens = _array(map(_string, series.values), len(series))
+        return tokens, np.full(len(tokens), 'stringValue', dtype=object)
+
+    pairs = [_scalar(_) for _ in series.values]
+    tokens = np.empty(len(pairs), dtype=object)
+    kinds = np.empty(len(pairs), dtype=object)
+    if pairs:
+        tokens[:], kinds[:] = zip(*pairs)
+
+    return tokens, kinds
+
+
+def _numbers(values):
+    """Encode a float array, leaving NaN and infinity empty."""
+    tokens = _array(map(repr, values.tolist()), len(values))
+    kinds = np.full(len(tokens), 'numberValue', dtype=object)
+    empty = ~np.isfinite(values)
+    tokens[empty], kinds[empty] = '""', None
+
+    return tokens, kinds
+
+
+def _array(tokens, size):
+    """Collect an iterable of tokens into an object array."""
+    array = np.empty(size, dtype=object)
+    array[:] = list(tokens)
+
+    return array
+
+
+def _scalar(value):
+    """Encode a single value from an object column."""
+    if isinstance(value, str):
+        return _string(value), 'stringValue'
+    if isinstance(value, (bool, np.bool_)):
+        return ('true' if value else 'false'), 'boolValue'
+    if value is None or value is pd.NaT or value is pd.NA:
+        return '""', None
+    if isinstance(value, numbers.Integral):
+        return str(int(value)), 'numberValue'
+    if isinstance(value, numbers.Real):
+        if not np.isfinite(value):
+            return '""', None
+        return repr(float(value)), 'numberValue'
+    if isinstance(value, (datetime.date, np.datetime64, np.timedelta64,
+                          datetime.timedelta)):
+        if isinstance(value, datetime.datetime) and value.tzinfo:
+            value = value.replace(tzinfo=None)
+        value = np.array([value])
+        if value.dtype == object:
+            value = value.astype('datetime64[ns]')
+        return _numbers(serial(value))[0][0], 'numberValue'
+
+    return _string(str(value)), 'stringValue'
+
+
+def values_json(data, chunk_rows=10000, header=True):
+    """Return the compact JSON body of a values update for a DataFrame,
+    with the column names as the first row unless header is False. Rows
+    are encoded in chunks to bound the number of intermediate tokens alive
+    at once.
+    """
+    rows = []
+    if header:
+        rows += [','.join(_string(str(_)) for _ in data.columns)]
+    for i in range(0, len(data) if data.shape[1] else 0, chunk_rows):
+        chunk = data.iloc[i:i + chunk_rows]
+        columns = [encode_column(chunk.iloc[:, j])[0]
+                   for j in range(chunk.shape[1])]
+        rows += ['],['.join(map(','.join, zip(*columns)))]
+
+    return '{"values":[[' + '],['.join(rows) + ']]}' if rows \
+        else '{"values":[]}'
+
+
+def number_formats(data):
+    """Return the default NumberFormat of the datetime and timedelta
+    columns of a DataFrame, which are otherwise shown as serial numbers.
+    """
+    formats = {}
+    for name, dtype in data.dtypes.items():
+        if isinstance(dtype, pd.DatetimeTZDtype) or dtype.kind == 'M':
+            values = data[name].dropna()
+            if (values == values.dt.normalize()).all():
+                formats[name] = {'type': 'DATE'}
+            else:
+                formats[name] = {'type': 'DATE_TIME'}
+        elif dtype.kind == 'm':
+            formats[name] = {'type': 'TIME', 'pattern': '[h]:mm:ss'}
+
+    return formats
+
+
+def cells_requests(
+    data, sheetId, start=(0, 0), formulas=False, formats=None,
+    chunk_rows=10000
+):
+    """Return updateCells requests writing a DataFrame, with the column
+    names as the first row, as typed ExtendedValues. Strings starting with
+    '=' are written as formulas if requested. One request is returned per
+    chunk of rows.
+
+    Formats map column names to a NumberFormat or a NUMBER pattern. They
+    are set by a repeatCell over the values of each run of adjacent
+    columns with the same format, so the number formats of the other
+    cells are left as they are.
+    """
+    if formats is None:
+        formats = {}
+
+    header = ','.join(
+        '{"userEnteredValue":{"stringValue":%s}}' % _string(str(_))
+        for _ in data.columns)
+
+    requests = []
+    for i in range(0, max(len(data), 1), chunk_rows):
+        chunk = data.iloc[i:i + chunk_rows]
+        columns = [_cells(chunk.iloc[:, j], formulas)
+                   for j in range(chunk.shape[1])]
+
+        rows = []
+        if i == 0:
+            rows += ['{"values":[' + header + ']}']
+        if len(chunk) and columns:
+            rows += ['{"values":[' + ','.join(_) + ']}'
+                     for _ in zip(*columns)]
+
+        row = start[0] + i + 1 if i else start[0]
+        requests += [Raw(
+            '{"updateCells":{"rows":[%s],"start":{"sheetId":%d,'
+            '"rowIndex":%d,"columnIndex":%d},'
+            '"fields":"userEnteredValue"}}' % (
+                ','.join(rows), sheetId, row, start[1]))]
+
+    fmts = [formats.get(_) for _ in data.columns]
+    fmts = [{'type': 'NUMBER', 'pattern': _} if isinstance(_, str) else _
+            for _ in fmts]
+    col = start[1]
+    for fmt, run in itertools.groupby(fmts):
+        width = len(list(run))
+        if fmt and len(data):
+            requests += [{
+                'repeatCell': {
+                    'range': {
+                        'sheetId': sheetId,
+                        'startRowIndex': start[0] + 1,
+                        'endRowIndex': start[0] + 1 + len(data),
+                        'startColumnIndex': col,
+                        'endColumnIndex': col + width,
+                    },
+                    'cell': {'userEnteredFormat': {'numberFormat': fmt}},
+                    'fields': 'userEnteredFormat.numberFormat',
+                }
+            }]
+        col += width
+
+    return requests
+
+
+def _cells(series, formulas=False):
+    """Encode a column as CellData tokens."""
+    tokens, kinds = encode_column(series)
+    if formulas:
+        formula = np.array([
+            k == 'stringValue' and t.startswith('"=')
+            for t, k in zip(tokens, kinds)], dtype=bool)
+        kinds[formula] = 'formulaValue'
+
+    filled = kinds.astype(bool)
+    cells = np.full(len(tokens), '{}', dtype=object)
+    cells[filled] = (
+        '{"userEnteredValue":{"' + kinds[filled] + '":' + tokens[filled]
+        + '}}')
+
+    return cells
+
+
+def requests_json(requests):
+    """Return the JSON body of a batchUpdate, splicing in requests that
+    are already encoded.
+    """
+    requests = ','.join(
+        _ if isinstance(_, Raw) else json.dumps(_) for _ in requests)
+
+    return '{"requests":[' + requests + ']}'
@@ -1,20 +1,64 @@
+import concurrent.futures
+import contextlib
+import itertools
 import json
+import re
+import sys
 import numpy as np
 import pandas as pd
-from xlsxwriter.utility import xl_cell_to_rowcol as xl
+import googleapi.batch
 import googleapi.client
+import googleapi.formatting
+import googleapi.ranges
+import googleapi.serialize
+
+# Characters removed, or replaced, to parse formatted numbers
+_NUMBER_FORMAT = str.maketrans({'$': None, ',': None, ')': None, '(': '-'})
+
+# Properties of a worksheet kept, as a tuple, until its Sheet is built
+_SHEET_KEYS = (
+    'title', 'sheetId', 'index', 'sheetType', 'hidden', 'tabColor',
+    'rightToLeft', 'gridProperties',
+)
+
+# Name of the constant row group of pivots materialized without rows
+_NO_ROWS = '\0'
+
+# Pandas aggregations of the pivot table summarize functions
+_SUMMARIZE_FUNCTIONS = {
+    'SUM': 'sum',
+    'COUNTA': 'count',
+    'COUNT': 'count',
+    'COUNTUNIQUE': 'nunique',
+    'AVERAGE': 'mean',
+    'MAX': 'max',
+    'MIN': 'min',
+    'MEDIAN': 'median',
+    'PRODUCT': 'prod',
+    'STDEV': 'std',
+    'STDEVP': lambda _: _.std(ddof=0),
+    'VAR': 'var',
+    'VARP': lambda _: _.var(ddof=0),
+}
 
 
 class SpreadSheet():
     """ A class for a spreadsheet object."""
 
+    __slots__ = (
+        'client', '_id', '_title', '_locale', '_autoRecalc', '_timeZone',
+        '_defaultFormat', '_spreadsheetTheme', '_tabs', '_sheets',
+        '_titles', '_current_datarange',
+    )
+
     def __init__(self, client=None, response=None, **kwargs):
 
         if client is None:
             client = googleapi.client.Client()
         self.client = client
 
-        if response is None:
+        new = response is None
+        if new:
             response = self.create(**kwargs)
         elif isinstance(response, str):
             response = self.get_workbook(id=response)
@@ -29,13 +73,26 @@ class SpreadSheet():
             self._defaultFormat = prop.get('defaultFormat')
             self._spreadsheetTheme = prop.get('spreadsheetTheme')
 
-            sheets_json = response['sheets']
-            self._sheets = [Sheet(self, _) for _ in sheets_json]
+            # Until first accessed, a worksheet is only kept as a tuple of
+            # the properties its Sheet copies, at its position in _tabs.
+            # Titles are indexed by position and built Sheets by sheetId
+            self._tabs = []
+            self._sheets = {}
+            self._titles = {}
+            for sheet_json in response['sheets']:
+                self._register(sheet_json)
+            if new:
+                for sheet in self._all_sheets():
+                    sheet.grid._usedRowCount = 0
+                    sheet.grid._usedColumnCount = 0
         else:
             raise ValueError()
 
         self._current_datarange = None
 
+        if new and kwargs.get('data') is not None:
+            self.sheet1.set_values(kwargs['data'])
+
     @property
     def id(self):
         """ID of the spreadsheet."""
@@ -70,7 +127,7 @@ class SpreadSheet():
                 'timeZone': self._timeZone,
                 'title': self._title,
             },
-            'sheets': [_.properties for _ in self._sheets],
+            'sheets': [_.properties for _ in self._all_sheets()],
             'spreadsheetId': self.id,
             'spreadsheetUrl': self.url,
         }
@@ -79,9 +136,14 @@ class SpreadSheet():
 
     def create(
         self, title, sheet_title='Data',
-        rows=1000, cols=26, freeze=None
+        rows=1000, cols=26, freeze=None, data=None
     ):
-        """Create a Spreadsheet."""
+        """Create a Spreadsheet. With data, a DataFrame, the grid is sized
+        to hold it, and SpreadSheet then writes it to the first worksheet.
+        """
+        if data is not None:
+            rows, cols = _grid_size(data, freeze)
+
         body = {
             'properties': {
                 'title': title
@@ -121,25 +183,80 @@ class SpreadSheet():
         """Returns the worksheet with the specified index or title. Index by
         title first, and then by index.
         """
-        sheets = self._sheets
-
         if not isinstance(index, (str, int)):
             ValueError('Specify integer index or title')
 
+        position = None
         if isinstance(index, str):
-            sheets = [_ for _ in sheets if getattr(_, 'title') == index]
+            position = self._titles.get(index)
         if isinstance(index, int):
-            sheets = [_ for _ in sheets if getattr(_, 'index') == index]
+            position = self._position(index)
 
-        if len(sheets) == 0:
+        if position is None:
             sheet = self.add_sheet(index)
         else:
-            sheet = sheets[0]
+            sheet = self._sheet(position)
 
         return sheet
 
-    def add_sheet(self, title, rows=1000, cols=26, freeze=None):
-        """ """
+    def _register(self, sheet_json):
+        """Add a worksheet as the tuple of its properties in _SHEET_KEYS.
+        The sheetType is interned as it is the same few strings for every
+        worksheet.
+        """
+        prop = sheet_json['properties']
+        get = prop.get
+        self._titles.setdefault(get('title', ''), len(self._tabs))
+        self._tabs.append((
+            get('title'), get('sheetId'), get('index'),
+            sys.intern(prop['sheetType']), get('hidden'), get('tabColor'),
+            get('rightToLeft'), get('gridProperties'),
+        ))
+
+    def _tab(self, position, key):
+        """Return the title, sheetId, index or sheetType of the worksheet at
+        a position, built or not.
+        """
+        tab = self._tabs[position]
+        if isinstance(tab, Sheet):
+            return getattr(tab, '_' + key)
+        return tab[_SHEET_KEYS.index(key)]
+
+    def _position(self, index):
+        """Return the position of the worksheet with an index, or None.
+        Worksheets are listed by index, so it is the index itself unless
+        the indexes have gaps.
+        """
+        if 0 <= index < len(self._tabs) and self._tab(index, 'index') == index:
+            return index
+        for position in range(len(self._tabs)):
+            if self._tab(position, 'index') == index:
+                return position
+
+        return None
+
+    def _sheet(self, position):
+        """Return the worksheet at a position, building it if needed."""
+        sheet = self._tabs[position]
+        if not isinstance(sheet, Sheet):
+            prop = {k: v for k, v in zip(_SHEET_KEYS, sheet) if v is not None}
+            sheet = Sheet(self, {'properties': prop})
+            self._tabs[position] = sheet
+            self._sheets[sheet.id] = sheet
+
+        return sheet
+
+    def _all_sheets(self):
+        """Return every worksheet, in order."""
+        return [self._sheet(_) for _ in range(len(self._tabs))]
+
+    def add_sheet(self, title, rows=1000, cols=26, freeze=None, data=None):
+        """Add a worksheet. With data, a DataFrame, the grid is sized to
+        hold it and it is written to the worksheet.
+        """
+        if data is not None:
+            rows, cols = _grid_size(data, freeze)
+
         request = {
             'addSheet': {
                 'properties': {
@@ -161,11 +278,219 @@ class SpreadSheet():
             spreadsheetId=self.id, body={'requests': request})
         response = self.client._execute_requests(request)
 
-        nsheet = Sheet(self, response['replies'][0]['addSheet'])
-        self._sheets += [nsheet]
+        sheet_json = response['replies'][0]['addSheet']
+        self._register(sheet_json)
+        nsheet = self._sheet(len(self._tabs) - 1)
+        nsheet.grid._usedRowCount = 0
+        nsheet.grid._usedColumnCount = 0
+
+        if data is not None:
+            nsheet.set_values(data)
 
         return nsheet
 
+    def update(self, request):
+        """Perform a batchUpdate on the spreadsheet.
+
+        The requests are optimized and split into as many batchUpdate as
+        needed to keep each body under the size limit. The replies are
+        returned in the order of the requests, with an empty reply for
+        requests that were merged or dropped. The cached header rows of
+        the worksheets are reset, as the requests may move or change them.
+        """
+        bodies, indexes = googleapi.batch.optimize(request)
+
+        replies = [{} for _ in request]
+        response = {'spreadsheetId': self.id, 'replies': replies}
+        for body, index in zip(bodies, indexes):
+            body = googleapi.serialize.requests_json(body)
+            batch = self.client.api['sheets'].spreadsheets().batchUpdate(
+                spreadsheetId=self.id, body={})
+            self.client._set_body(batch, body)
+
+            result = self.client._execute_requests(batch)
+            for i, reply in zip(index, result.get('replies', [])):
+                replies[i] = reply
+
+        self.client._modified(self.id)
+        for sheet in self._sheets.values():
+            sheet._headers = None
+
+        return response
+
+    def compact(self):
+        """Delete the rows and columns past the used range of every
+        worksheet in a single batchUpdate. See Sheet.compact.
+        """
+        sheets = [_ for _ in self._all_sheets() if _._sheetType == 'GRID']
+        self._probe(sheets)
+        request = []
+        for sheet in sheets:
+            request += sheet._compact_request()
+        if not request:
+            return None
+
+        response = self.update(request)
+        for sheet in sheets:
+            sheet._compacted()
+
+        return response
+
+    def _probe(self, sheets):
+        """Set the used extent and the grid size of some worksheets from a
+        single batchGet of their whole values. Trailing empty rows and
+        columns are left out by the API, and formulas are read as such so
+        that they count as used. See Sheet._seed.
+        """
+        if not sheets:
+            return
+
+        request = self.client.api['sheets'].spreadsheets().values().batchGet(
+            spreadsheetId=self.id,
+            ranges=[googleapi.ranges.quote(_.title) for _ in sheets],
+            valueRenderOption='FORMULA',
+            fields='valueRanges(range,values)'
+        )
+        response = self.client._execute_requests(request)
+
+        for sheet, value_range in zip(sheets, response['valueRanges']):
+            sheet._seed(
+                value_range.get('values', []), value_range.get('range'))
+
+    @contextlib.contextmanager
+    def bulk_load(self, recalc='HOUR', hide=None):
+        """Context manager for large writes. The spreadsheet recalculates
+        with the lower frequency recalc, e.g. HOUR or MINUTE, instead of on
+        every change, and the worksheets in hide, by title, are hidden. The
+        original properties are restored in one batchUpdate on exit.
+        """
+        hide = list(dict.fromkeys(hide or []))
+        if any(_ not in self._titles for _ in hide):
+            raise ValueError('Worksheets to hide not found')
+        sheets = [self._sheet(self._titles[_]) for _ in hide]
+        autoRecalc = self._autoRecalc or 'ON_CHANGE'
+        hidden = [_._hidden for _ in sheets]
+
+        self.update(self._bulk_load_request(
+            recalc, sheets, [True] * len(sheets)))
+        self._autoRecalc = recalc
+        for sheet in sheets:
+            sheet._hidden = True
+
+        try:
+            yield self
+        finally:
+            self.update(self._bulk_load_request(
+                autoRecalc, sheets, [bool(_) for _ in hidden]))
+            self._autoRecalc = autoRecalc
+            for sheet, h in zip(sheets, hidden):
+                sheet._hidden = h
+
+    def _bulk_load_request(self, autoRecalc, sheets, hidden):
+        """Return the requests setting the recalculation of the spreadsheet
+        and the visibility of some worksheets.
+        """
+        request = [{
+            'updateSpreadsheetProperties': {
+                'properties': {'autoRecalc': autoRecalc},
+                'fields': 'autoRecalc',
+            }
+        }]
+        for sheet, h in zip(sheets, hidden):
+            request += [{
+                'updateSheetProperties': {
+                    'properties': {'sheetId': sheet.id, 'hidden': h},
+                    'fields': 'hidden',
+                }
+            }]
+
+        return request
+
+    def read_all(
+        self, sheets=None, range=None, source='sheet', typed=False,
+        dates=None, dtypes=None, compact=False
+    ):
+        """Read the same range of many worksheets into a single DataFrame.
+
+        Sheets is a list of titles or a regular expression matching whole
+        titles, and defaults to every grid worksheet. The ranges are read
+        with one batchGet, without a range the whole worksheets. The types
+        of the values of each worksheet are inferred before its rows are
+        stacked, and its columns aligned by their header, in order of first
+        appearance. A repeated header name, such as a blank one, is aligned
+        with the same occurrence of the name in the other worksheets. The
+        title of the worksheet of each row is added as a categorical source
+        column, unless source is None, which must not be a column already.
+        Typed, dates, dtypes and compact are as for Sheet.get_values.
+        """
+        titles = [
+            title for title, position in self._titles.items()
+            if self._tab(position, 'sheetType') == 'GRID']
+
+        if isinstance(sheets, str):
+            titles = [_ for _ in titles if re.fullmatch(sheets, _)]
+        elif sheets is not None:
+            missing = [_ for _ in sheets if _ not in self._titles]
+            if missing:
+                raise ValueError(f'Worksheets {missing} not found')
+            titles = list(sheets)
+        if not titles:
+            raise ValueError('No worksheets to read')
+
+        ranges = [googleapi.ranges.quote(_) for _ in titles]
+        if range is not None:
+            ranges = [f'{_}!{range}' for _ in ranges]
+
+        request = self.client.api['sheets'].spreadsheets().values().batchGet(
+            spreadsheetId=self.id,
+            ranges=ranges,
+            **_render_options(typed)
+        )
+        response = self.client._execute_requests(request)
+
+        # The columns of every worksheet are aligned on the union of their
+        # headers, by name and occurrence of the name, and labelled by
+        # their position in it until the blocks are stacked
+        header, blocks, lengths = {}, [], []
+        for value_range in response.get('valueRanges', []):
+            values = value_range.get('values') or [[]]
+            names = [str(_).strip() for _ in values[0]]
+            keys = [(name, names[:i].count(name))
+                    for i, name in enumerate(names)]
+            for key in keys:
+                header.setdefault(key, len(header))
+            if source is not None and source in names:
+                raise ValueError(f'Column {source} already in the data')
+
+            lengths += [len(values) - 1]
+            if not lengths[-1]:
+                continue
+            block = pd.DataFrame(
+                _normalize(values[1:], len(names)), columns=names)
+            if typed:
+                block = _typed(block, dates, dtypes)
+            else:
+                block = _infer(block, dtypes)
+            block.columns = [header[_] for _ in keys]
+            blocks += [block]
+
+        columns = pd.RangeIndex(len(header))
+        if blocks:
+            data = pd.concat(blocks, ignore_index=True, sort=True, copy=False)
+            if not data.columns.equals(columns):
+                data = data.reindex(columns=columns)
+        else:
+            data = pd.DataFrame(columns=columns)
+        data.columns = [name for name, _ in header]
+        if compact:
+            data = _compact(data, arrow=compact == 'arrow')
+
+        if source is not None:
+            codes = np.repeat(np.arange(len(lengths)), lengths)
+            data[source] = pd.Categorical.from_codes(codes, titles)
+
+        return data
+
     def share(self, email, role='reader', message=None):
         """Share permissions, specific to an individual user."""
         body = {
@@ -191,6 +516,12 @@ class SpreadSheet():
 class Sheet():
     """A class for a worksheet object."""
 
+    __slots__ = (
+        '_spreadsheet', '_title', '_sheetId', '_index', '_sheetType',
+        '_hidden', '_tabColor', '_rightToLeft', '_grid_json', '_grid',
+        '_headers',
+    )
+
     def __init__(self, spreadsheet, response):
         self._spreadsheet = spreadsheet
         self._title = response['properties'].get('title', '')
@@ -198,11 +529,22 @@ class Sheet():
         self._index = response['properties']['index']
         self._sheetType = response['properties']['sheetType']
         self._hidden = response['properties'].get('hidden', None)
-        self._tabColor = response['properties'].get('tabColor', {})
+        self._tabColor = response['properties'].get('tabColor')
         self._rightToLeft = response['properties'].get('rightToLeft', False)
 
-        grid_json = response['properties']['gridProperties']
-        self.grid = Grid(response=grid_json)
+        # The Grid is only built from its JSON when first used
+        self._grid_json = response['properties'].get('gridProperties', {})
+        self._grid = None
+
+        self._headers = None
+
+    @property
+    def grid(self):
+        """Grid of the worksheet."""
+        if self._grid is None:
+            self._grid = Grid(response=self._grid_json)
+            self._grid_json = None
+        return self._grid
 
     @property
     def id(self):
@@ -230,7 +572,7 @@ class Sheet():
                 'index': self._index,
                 'sheetType': self._sheetType,
                 'hidden': self._hidden,
-                'tabColor': self._tabColor,
+                'tabColor': self._tabColor or {},
                 'rightToLeft': self._rightToLeft,
                 'gridProperties': self.grid.properties,
             }
@@ -241,7 +583,9 @@ class Sheet():
     def _add_sheet(self, request):
         """Check request for missing sheet names."""
         for i in request:
-            if 'repeatCell' in i:
+            if isinstance(i, googleapi.serialize.Raw):
+                continue
+            elif 'repeatCell' in i:
                 i['repeatCell']['range']['sheetId'] = self.id
             elif 'updateSheetProperties' in i:
                 i['updateSheetProperties']['properties']['sheetId'] = self.id
@@ -249,73 +593,556 @@ class Sheet():
                 i['autoResizeDimensions']['dimensions']['sheetId'] = self.id
             elif 'updateDimensionProperties' in i:
                 i['updateDimensionProperties']['range']['sheetId'] = self.id
+            elif 'appendDimension' in i:
+                i['appendDimension']['sheetId'] = self.id
+            elif 'updateCells' in i and 'start' in i['updateCells']:
+                i['updateCells']['start']['sheetId'] = self.id
 
         return request
 
     def update(self, request):
-        """Perform and general update on a worksheet."""
+        """Perform and general update on a worksheet. Requests without a
+        sheetId apply to this worksheet. See SpreadSheet.update.
+        """
         request = self._add_sheet(request)
+        response = self._spreadsheet.update(request)
+
+        return response
+
+    def set_values(
+        self, data, range='A1', valueInputOption='RAW',
+        typed=False, formats=None, autofit=False, clear=None
+    ):
+        """Update the values of a spreadsheet.
+
+        With typed, values are written with updateCells as ExtendedValues
+        following the DataFrame dtypes, so the server does not parse them.
+        Strings starting with '=' are written as formulas and formats maps
+        column names to a NumberFormat or NUMBER pattern. Datetime columns
+        are given a date format by default.
+
+        With autofit, the column widths are estimated locally from the data
+        instead of with a server side autoResizeDimensions. The values of
+        the ranges in clear, of this or other worksheets, are cleared
+        before the write.
+
+        If the data extends past the locally tracked grid, the required
+        appendDimension requests are sent in the same batchUpdate as the
+        values, which are then written with updateCells. The same applies
+        to the column widths of autofit and the ranges to clear. Values
+        with valueInputOption USER_ENTERED are always written with a
+        values update, after that batchUpdate, so that the server parses
+        them the same way whatever the size of the data.
+        """
+        start = googleapi.ranges.start(range)
+        nrows = start[0] + data.shape[0] + 1
+        ncols = start[1] + data.shape[1]
 
         sh = self._spreadsheet
-        request = sh.client.api['sheets'].spreadsheets().batchUpdate(
-            spreadsheetId=sh.id, body={'requests': request})
+        expand = self.grid._append_dimensions(nrows, ncols)
+        batch = typed or expand or autofit or clear
+        cells = typed or valueInputOption == 'RAW'
+        if batch:
+            if typed:
+                formats = {
+                    **googleapi.serialize.number_formats(data),
+                    **(formats or {})}
+
+            cleared = self._grid_ranges(clear or [])
+            request = [
+                {'updateCells': {'range': _, 'fields': 'userEnteredValue'}}
+                for _ in cleared]
+            request += expand
+            if cells:
+                request += googleapi.serialize.cells_requests(
+                    data, self.id, start, formulas=typed, formats=formats)
+            if autofit:
+                widths = googleapi.formatting.column_widths(data)
+                request += googleapi.formatting.width_requests(
+                    widths, start[1])
+            self.update(request)
+            self._cleared(cleared)
+            self.grid._rowCount = max(self.grid._rowCount or 0, nrows)
+            self.grid._columnCount = max(self.grid._columnCount or 0, ncols)
+
+            response = {
+                'spreadsheetId': sh.id,
+                'updatedRange': self._a1(range),
+            }
+        if not (batch and cells):
+            request = sh.client.api['sheets'].spreadsheets().values().update(
+                spreadsheetId=sh.id,
+                range=self._a1(range),
+                valueInputOption=valueInputOption,
+                body={}
+            )
+            # Encoded column-wise straight into the compact request body
+            sh.client._set_body(
+                request, googleapi.serialize.values_json(data))
+            response = sh.client._execute_requests(request)
+            sh.client._modified(sh.id)
+
+        self.grid._use(nrows, ncols)
+
+        # The written frame is already typed, so it is wrapped as it is
+        self._headers = None
+        data = DataRange(response, data, sheetId=self.id, infer=False)
+        self._spreadsheet._current_datarange = data
+
+        return data
 
+    def append_values(self, data, range='A1', valueInputOption='RAW'):
+        """Append the rows of a DataFrame, without its column names, after
+        the table found at range. The grid is extended by the API as needed.
+        """
+        sh = self._spreadsheet
+        request = sh.client.api['sheets'].spreadsheets().values().append(
+            spreadsheetId=sh.id,
+            range=self._a1(range),
+            valueInputOption=valueInputOption,
+            insertDataOption='OVERWRITE',
+            body={}
+        )
+        sh.client._set_body(
+            request, googleapi.serialize.values_json(data, header=False))
         response = sh.client._execute_requests(request)
+        sh.client._modified(sh.id)
+        self._headers = None
+
+        updated = response.get('updates', {}).get('updatedRange')
+        if updated:
+            _, _, rows, _, cols = googleapi.ranges.parse(updated)
+            self.grid._use(rows, cols)
+            self.grid._rowCount = max(self.grid._rowCount or 0, rows)
+
         return response
 
-    def set_values(self, data, range='A1', valueInputOption='RAW'):
-        """Update the values of a spreadsheet."""
-        if isinstance(data, pd.DataFrame):
-            _data = np.vstack([data.columns, data.values]).tolist()
+    def set_formats(self, styles, range='A1'):
+        """Format a block of cells from a 2-D grid of CellFormat, or None to
+        leave a cell as it is, starting at range. The grid is compiled into
+        the fewest repeatCell and updateCells requests, which are sent in
+        one batchUpdate. See googleapi.formatting.style_grid to build the
+        grid of a DataFrame from per-column and per-row formats.
+        """
+        start = googleapi.ranges.start(range)
+        request = googleapi.formatting.compile_formats(styles, start)
+        if not request:
+            return None
 
+        response = self.update(request)
+        return response
+
+    def clear_values_many(self, ranges):
+        """Clear the values of many ranges, of this or other worksheets, in
+        a single batchClear. Ranges without a worksheet title refer to this
+        worksheet, and a worksheet title alone to the whole worksheet, as
+        for the clear argument of set_values.
+        """
         sh = self._spreadsheet
-        request = sh.client.api['sheets'].spreadsheets().values().update(
+
+        # Unknown worksheets raise before anything is cleared
+        grid_ranges = self._grid_ranges(ranges)
+        ranges = [
+            googleapi.ranges.to_a1(googleapi.ranges.grid_range(cells), title)
+            for title, cells in map(self._split, ranges)]
+
+        request = sh.client.api['sheets'].spreadsheets().values().batchClear(
             spreadsheetId=sh.id,
-            range=f'{self.title}!{range}',
-            valueInputOption=valueInputOption,
-            body={'values': _data}
+            body={'ranges': ranges}
         )
         response = sh.client._execute_requests(request)
+        sh.client._modified(sh.id)
+        self._cleared(grid_ranges)
 
-        data = DataRange(response, data, sheetId=self.id)
-        self._spreadsheet._current_datarange = data
+        return response
 
-        return data
+    def _grid_ranges(self, ranges):
+        """Convert A1 ranges, of this or other worksheets, to GridRanges."""
+        grid_ranges = []
+        for rng in ranges:
+            title, cells = self._split(rng)
+
+            position = self._spreadsheet._titles.get(title)
+            if position is None:
+                raise ValueError(f'Worksheet {title} not found')
+            sheetId = self._spreadsheet._tab(position, 'sheetId')
+
+            grid_ranges += [googleapi.ranges.grid_range(cells, sheetId)]
+
+        return grid_ranges
+
+    def _split(self, rng):
+        """Split an A1 range of this or another worksheet into its title
+        and cells. The title of a worksheet alone is the whole worksheet,
+        even when it reads as cells, such as Jan or Q1.
+        """
+        if rng in self._spreadsheet._titles:
+            return rng, ''
+
+        title, cells = googleapi.ranges.split(rng)
+        return title or self.title, cells
+
+    def _a1(self, rng):
+        """Return a range of this worksheet in A1 notation, with its title
+        quoted where needed.
+        """
+        return f'{googleapi.ranges.quote(self.title)}!{rng}'
+
+    def _cleared(self, grid_ranges):
+        """Update the used extent and reset the cached header rows of the
+        worksheets of cleared ranges. Worksheets that were not built yet
+        have neither.
+        """
+        sheets = self._spreadsheet._sheets
+        for grid_range in grid_ranges:
+            if grid_range['sheetId'] in sheets:
+                sheets[grid_range['sheetId']].grid._clear(grid_range)
+                sheets[grid_range['sheetId']]._headers = None
 
     def clear_values(self, rng):
 
         sh = self._spreadsheet
         request = sh.client.api['sheets'].spreadsheets().values().clear(
             spreadsheetId=sh.id,
-            range=f'{self.title}!{rng}'
+            range=self._a1(rng)
         )
         response = sh.client._execute_requests(request)
+        sh.client._modified(sh.id)
+        self.grid._clear(googleapi.ranges.grid_range(rng))
+        self._headers = None
+
+        return response
+
+    @property
+    def used_range(self):
+        """A1 range of the values of the worksheet, from A1. The extent is
+        tracked locally through the writes and clears of this library, and
+        probed with a read of the whole worksheet when unknown. Trailing
+        empty rows and columns are left out of values by the API, and
+        formulas are read as such so that they count as used.
+        """
+        rows, cols = self._used()
+        if not rows:
+            return None
+        return googleapi.ranges.to_a1((0, rows, 0, cols), self.title)
+
+    def _used(self):
+        """Return the used rows and columns, probing them if unknown."""
+        if self.grid.used is None:
+            self._spreadsheet._probe([self])
+
+        return self.grid.used
+
+    def _seed(self, values, rng=None):
+        """Set the used extent from the values of the whole worksheet. The
+        range returned for a whole worksheet covers its grid, whose size
+        is then updated too, as it may have been resized by others.
+        """
+        if rng is not None:
+            _, _, rows, _, cols = googleapi.ranges.parse(rng)
+            self.grid._rowCount = rows or self.grid._rowCount
+            self.grid._columnCount = cols or self.grid._columnCount
+
+        self.grid._usedRowCount = len(values)
+        self.grid._usedColumnCount = max(map(len, values), default=0)
+        if not self.grid._usedColumnCount:
+            self.grid._usedRowCount = 0
+
+    def compact(self):
+        """Delete the rows and columns past the used range in a single
+        batchUpdate. Frozen rows and columns, and at least one row and
+        column, are kept. The used range is always probed first, since
+        cells may have been written by other requests or users.
+        """
+        if self._sheetType != 'GRID':
+            return None
+        self._spreadsheet._probe([self])
+
+        request = self._compact_request()
+        if not request:
+            return None
+
+        response = self.update(request)
+        self._compacted()
 
         return response
 
-    def get_values(self, range):
-        """Get the values of a spreadsheet."""
+    def _compact_request(self):
+        """Return the deleteDimension requests of compact."""
+        if self._sheetType != 'GRID':
+            return []
+
+        grid = self.grid
+        keep = self._compact_size()
+        request = []
+        for dimension, count, size in [
+            ('ROWS', grid._rowCount, keep[0]),
+            ('COLUMNS', grid._columnCount, keep[1]),
+        ]:
+            if count is not None and count > size:
+                # Unbounded, to the end of the grid whatever its size
+                request += [{
+                    'deleteDimension': {
+                        'range': {
+                            'sheetId': self.id,
+                            'dimension': dimension,
+                            'startIndex': size,
+                        }
+                    }
+                }]
+
+        return request
+
+    def _compact_size(self):
+        """Return the number of rows and columns kept by compact."""
+        grid = self.grid
+        rows, cols = grid.used
+        rows = max(rows, (grid._frozenRowCount or 0) + 1, 1)
+        cols = max(cols, (grid._frozenColumnCount or 0) + 1, 1)
+
+        return rows, cols
+
+    def _compacted(self):
+        """Resize the grid after compact."""
+        if self._sheetType != 'GRID':
+            return
+        rows, cols = self._compact_size()
+        self.grid._rowCount = min(self.grid._rowCount, rows)
+        self.grid._columnCount = min(self.grid._columnCount, cols)
+
+    def get_values(
+        self, range=None, typed=False, dates=None, dtypes=None, compact=False
+    ):
+        """Get the values of a spreadsheet.
+
+        Without a range, exactly the used range of the worksheet is read,
+        or the whole worksheet while it is not known yet, which then sets
+        the used range.
+
+        With typed, unformatted values are requested and used as they are
+        instead of being parsed from their formatted strings. Dates are
+        then returned as serial numbers, and the columns listed in dates
+        are converted to datetimes. Columns in dtypes are cast to the given
+        dtype without any type inference.
+
+        With compact, repeated strings are stored as categoricals and
+        numbers in the smallest nullable dtype. Use compact='arrow' to also
+        store the remaining strings in Arrow arrays, which needs pyarrow.
+
+        If the client has a ReadCache, unchanged ranges are returned from
+        it, and the returned DataRange may be shared with later reads.
+        """
         sh = self._spreadsheet
+        cache = sh.client.cache
+        if cache is not None:
+            key = (sh.id, self.id, range, typed, compact,
+                   json.dumps([dates, dtypes], default=str, sort_keys=True))
+            version = cache.version(sh.client, sh.id)
+            data = cache.get(key, version)
+            if data is not None:
+                self._spreadsheet._current_datarange = data
+                return data
+
+        if range is not None:
+            rng = self._a1(range)
+        elif self.grid.used and self.grid.used[0]:
+            rng = self.used_range
+        else:
+            rng = googleapi.ranges.quote(self.title)
+
         request = sh.client.api['sheets'].spreadsheets().values().get(
             spreadsheetId=sh.id,
-            range=f'{self.title}!{range}'
+            range=rng,
+            **_render_options(typed)
+        )
+        response = sh.client._execute_requests(request)
+        if range is None and self.grid.used is None:
+            self._seed(response.get('values', []), response.get('range'))
+
+        data = DataRange(
+            response, sheetId=self.id, typed=typed, dates=dates,
+            dtypes=dtypes, compact=compact)
+        self._spreadsheet._current_datarange = data
+        if cache is not None:
+            cache.put(key, version, data)
+
+        return data
+
+    def get_columns(
+        self, names, header_row=1, typed=False, dates=None, dtypes=None,
+        compact=False
+    ):
+        """Get only the named columns of a spreadsheet. The header row is
+        read once and cached, and the columns are then fetched with a single
+        batchGet. Typed, dates, dtypes and compact are as for get_values.
+        """
+        sh = self._spreadsheet
+        header = self._header_index(header_row)
+
+        columns = []
+        for name in names:
+            if name not in header:
+                raise ValueError(f'Column {name} not found in the header')
+            columns += [header[name]]
+
+        ranges = []
+        for col in columns:
+            ranges += [googleapi.ranges.to_a1(
+                (header_row - 1, None, col, col + 1), self.title)]
+
+        request = sh.client.api['sheets'].spreadsheets().values().batchGet(
+            spreadsheetId=sh.id,
+            ranges=ranges,
+            majorDimension='COLUMNS',
+            **_render_options(typed)
         )
         response = sh.client._execute_requests(request)
 
-        data = DataRange(response, sheetId=self.id)
+        values = [_.get('values', [[]])[0] for _ in response['valueRanges']]
+        values = [list(_) for _ in itertools.zip_longest(*values)]
+        values[0] = list(names)
+
+        response = {'spreadsheetId': sh.id, 'range': ranges[0],
+                    'values': values}
+        data = DataRange(
+            response, sheetId=self.id, typed=typed, dates=dates,
+            columns=columns, dtypes=dtypes, compact=compact)
         self._spreadsheet._current_datarange = data
 
         return data
 
+    def _header_index(self, header_row=1):
+        """Return the column index of each name in a header row."""
+        if self._headers is None:
+            self._headers = {}
+        if header_row not in self._headers:
+            sh = self._spreadsheet
+            request = sh.client.api['sheets'].spreadsheets().values().get(
+                spreadsheetId=sh.id,
+                range=self._a1(f'{header_row}:{header_row}')
+            )
+            response = sh.client._execute_requests(request)
+
+            header = response.get('values', [[]])[0]
+            self._headers[header_row] = {
+                str(v).strip(): i for i, v in enumerate(header) if v != ''}
+
+        return self._headers[header_row]
+
+    def iter_values(
+        self, range, chunk_rows=10000, typed=False, dates=None, dtypes=None
+    ):
+        """Iterate over the values of a large range as DataFrames of at
+        most chunk_rows rows. Each window is fetched while the previous one
+        is being processed. The header row of the range is carried over to
+        every chunk, which are cast to the dtypes of the first chunk.
+        Typed, dates and dtypes are as for get_values.
+
+        The API leaves out the trailing empty rows of each window, so the
+        iteration ends at the end of the range or of the grid, or at the
+        first window without any values.
+        """
+        _, row0, row1, col0, col1 = googleapi.ranges.parse(range)
+        row0 = (row0 or 0) + 1
+        last = min(
+            _ for _ in [row1, self.grid._rowCount, float('inf')] if _)
+
+        sh = self._spreadsheet
+        http = sh.client._http()
+
+        def fetch(top, bottom):
+            request = sh.client.api['sheets'].spreadsheets().values().get(
+                spreadsheetId=sh.id,
+                range=googleapi.ranges.to_a1(
+                    (top - 1, bottom, col0, col1), self.title),
+                **_render_options(typed)
+            )
+            return sh.client._execute_requests(request, http=http)
+
+        def window(top, size):
+            return top, min(top + size - 1, last)
+
+        header, schema = None, dtypes
+        blank = 0
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as pool:
+            top, bottom = window(row0, chunk_rows + 1)
+            future = pool.submit(fetch, top, bottom)
+            while future is not None:
+                response = future.result()
+                values = response.get('values', [])
+                trimmed = bottom - top + 1 - len(values)
+
+                top, bottom = window(bottom + 1, chunk_rows)
+                future = None
+                if values and top <= last:
+                    future = pool.submit(fetch, top, bottom)
+
+                if header is None and values:
+                    header, values = values[0], values[1:]
+                if not values:
+                    continue
+
+                # The trailing empty rows of the previous window are only
+                # known to be inside the data once this one has values
+                values = [[]] * blank + values
+                blank = trimmed
+
+                data = DataRange(
+                    {'range': response['range'], 'values': [header] + values},
+                    sheetId=self.id, typed=typed, dates=dates,
+                    dtypes=schema).data
+                if schema is dtypes:
+                    # Later chunks may have empty cells in integer columns
+                    ints = {k: 'Int64' for k, v in data.dtypes.items()
+                            if v.kind in 'iu'}
+                    data = data.astype(ints)
+                    schema = data.dtypes.to_dict()
+
+                yield data
+
     def add_pivot(
             self, rows, values, columns=None, filters=None,
-            position='A1', datarange=None):
-        """TODO """
+            position='A1', datarange=None, materialize=False):
+        """Add a pivot table of a datarange at a position.
+
+        With materialize, the pivot table is computed locally from the data
+        of the datarange and written as static values instead.
+        """
         if datarange is None:
             datarange = self._spreadsheet._current_datarange
 
+        if materialize:
+            return self._materialize_pivot(
+                rows, values, columns, filters, position, datarange)
+
+        request = self._pivot_request(
+            rows, values, columns, filters, position, datarange)
+        response = self.update(request)
+        return response
+
+    def add_pivots(self, pivots):
+        """Add many pivot tables in a single batchUpdate, split by size
+        as needed. Each pivot is a dict of the arguments of add_pivot,
+        which must include its datarange.
+        """
+        request = []
+        for pivot in pivots:
+            pivot = dict(pivot)
+            if pivot.get('datarange') is None:
+                raise ValueError('Specify the datarange of each pivot')
+            if pivot.pop('materialize', False):
+                raise ValueError('Pivots cannot be materialized in a batch')
+            request += self._pivot_request(**pivot)
+
+        response = self.update(request)
+        return response
+
+    def _pivot_request(
+            self, rows, values, columns=None, filters=None,
+            position='A1', datarange=None):
+        """Return the updateCells request of a pivot table."""
         if isinstance(position, str):
-            position = xl(position)
+            position = googleapi.ranges.start(position)
 
         ro = []
         if isinstance(rows, list):
@@ -403,17 +1230,132 @@ class Sheet():
             },
         }]
 
-        response = self.update(request)
+        return request
+
+    def _materialize_pivot(
+            self, rows, values, columns, filters, position, datarange):
+        """Compute a pivot table with pandas and write it as values."""
+        data = datarange.data
+        for k, v in (filters or {}).items():
+            if not isinstance(v, list):
+                v = [v]
+            data = data[data[k].isin(v)]
+
+        options = {}
+        for spec in (rows, columns):
+            if isinstance(spec, dict):
+                options.update(spec)
+            elif isinstance(spec, list):
+                options.update({_: {} for _ in spec})
+        index = list(rows or [])
+        columns = list(columns or [])
+
+        # One named aggregation per value, labelled as in the live pivot
+        named = {}
+        for n in values:
+            if isinstance(n, str):
+                n = {n: 'SUM'}
+            for k, v in n.items():
+                if v.startswith('=') or v not in _SUMMARIZE_FUNCTIONS:
+                    raise ValueError(
+                        f'Summarize function {v} cannot be materialized')
+                named[f'{v} of {k}'] = (k, _SUMMARIZE_FUNCTIONS[v])
+
+        # Totals follow the showTotals of the outermost group, which is
+        # on by default for rows given as a list only
+        row_totals = bool(index) and options[index[0]].get(
+            'showTotals', isinstance(rows, list))
+        column_totals = bool(columns) and options[columns[0]].get(
+            'showTotals', False)
+
+        if not index:
+            data = data.assign(**{_NO_ROWS: ''})
+            index = [_NO_ROWS]
+
+        def build(data):
+            table = data.groupby(index + columns).agg(**named)
+            if not columns:
+                return table
+
+            table = table.unstack(columns)
+            if column_totals:
+                totals = data.groupby(index).agg(**named)
+                totals.columns = pd.MultiIndex.from_tuples([
+                    (_, 'Grand Total', *[''] * (len(columns) - 1))
+                    for _ in totals.columns])
+                table = pd.concat([table, totals], axis=1)
+                table = table[[
+                    c for label in named for c in table.columns
+                    if c[0] == label]]
+
+            return table
+
+        table = build(data)
+
+        ascending = [
+            options[_].get('sortOrder', 'ASCENDING') == 'ASCENDING'
+            for _ in index if _ != _NO_ROWS]
+        if not all(ascending):
+            # A list is ignored by pandas for a single level index
+            if len(ascending) == 1:
+                ascending = ascending[0]
+            table = table.sort_index(ascending=ascending)
+
+        if row_totals:
+            grand = data.assign(**{
+                k: 'Grand Total' if i == 0 else ''
+                for i, k in enumerate(index)})
+            table = pd.concat([table, build(grand)])
+
+        table = table.reset_index()
+        if isinstance(table.columns, pd.MultiIndex):
+            table.columns = [
+                ' '.join(str(_) for _ in col if _ != '').strip()
+                for col in table.columns]
+        if _NO_ROWS in table.columns:
+            table = table.drop(columns=_NO_ROWS)
+
+        if not isinstance(position, str):
+            position = googleapi.ranges.rowcol_to_cell(*position)
+
+        current = self._spreadsheet._current_datarange
+        response = self.set_values(table, range=position)
+        self._spreadsheet._current_datarange = current
+
         return response
 
     def add_slicer(
         self, tag, position='A1', filter=None,
         title=None, datarange=None
     ):
-        """ """
+        """Add a slicer over a column of a datarange at a position."""
         if datarange is None:
             datarange = self._spreadsheet._current_datarange
 
+        request = self._slicer_request(
+            tag, position, filter, title, datarange)
+        response = self.update(request)
+        return response
+
+    def add_slicers(self, slicers):
+        """Add many slicers in a single batchUpdate, split by size as
+        needed. Each slicer is a dict of the arguments of add_slicer,
+        which must include its datarange.
+        """
+        request = []
+        for slicer in slicers:
+            if slicer.get('datarange') is None:
+                raise ValueError('Specify the datarange of each slicer')
+            request += self._slicer_request(**slicer)
+
+        response = self.update(request)
+        return response
+
+    def _slicer_request(
+        self, tag, position='A1', filter=None,
+        title=None, datarange=None
+    ):
+        """Return the addSlicer request of a slicer."""
         if not isinstance(filter, dict):
             filter = {}
 
@@ -421,7 +1363,7 @@ class Sheet():
             title = tag
 
         if isinstance(position, str):
-            position = xl(position)
+            position = googleapi.ranges.start(position)
 
         slicer = {
             'spec': {
@@ -449,8 +1391,7 @@ class Sheet():
         }
 
         request = [{'addSlicer': {'slicer': slicer}}]
-        response = self.update(request)
-        return response
+        return request
 
     def __repr__(self):
         return json.dumps(self.properties, indent=4, separators=(',', ': '))
@@ -459,6 +1400,12 @@ class Sheet():
 class Grid():
     """A Class for a Grid within a sheet."""
 
+    __slots__ = (
+        '_rowCount', '_columnCount', '_frozenRowCount', '_frozenColumnCount',
+        '_hideGridlines', '_rowGroupControlAfter', '_columnGroupControlAfter',
+        '_usedRowCount', '_usedColumnCount',
+    )
+
     def __init__(self, response):
         self._rowCount = response.get('rowCount')
         self._columnCount = response.get('columnCount')
@@ -470,6 +1417,10 @@ class Grid():
         self._rowGroupControlAfter = response.get('rowGroupControlAfter')
         self._columnGroupControlAfter = response.get('columnGroupControlAfter')
 
+        # Extent of the values from A1, or None until it is known
+        self._usedRowCount = None
+        self._usedColumnCount = None
+
     @property
     def properties(self):
         """Return the Google API formatted JSON of the properties
@@ -487,50 +1438,324 @@ class Grid():
 
         return properties
 
+    def _append_dimensions(self, rows, cols):
+        """Return the appendDimension requests needed for the grid to hold
+        the given number of rows and columns.
+        """
+        request = []
+        if self._rowCount is not None and rows > self._rowCount:
+            request += [{
+                'appendDimension': {
+                    'dimension': 'ROWS',
+                    'length': rows - self._rowCount,
+                }
+            }]
+        if self._columnCount is not None and cols > self._columnCount:
+            request += [{
+                'appendDimension': {
+                    'dimension': 'COLUMNS',
+                    'length': cols - self._columnCount,
+                }
+            }]
+
+        return request
+
+    @property
+    def used(self):
+        """Number of rows and columns from A1 holding values, as known
+        locally, or None. After partial clears it is an upper bound.
+        """
+        if self._usedRowCount is None:
+            return None
+        return self._usedRowCount, self._usedColumnCount
+
+    def _use(self, rows, cols):
+        """Extend the known used extent to some rows and columns."""
+        if self._usedRowCount is not None:
+            self._usedRowCount = max(self._usedRowCount, rows)
+            self._usedColumnCount = max(self._usedColumnCount, cols)
+
+    def _clear(self, grid_range):
+        """Shrink the known used extent after a range is cleared, where the
+        range covers the last rows or columns in use.
+        """
+        if self._usedRowCount is None:
+            return
+        r0 = grid_range.get('startRowIndex', 0)
+        r1 = grid_range.get('endRowIndex', float('inf'))
+        c0 = grid_range.get('startColumnIndex', 0)
+        c1 = grid_range.get('endColumnIndex', float('inf'))
+
+        if c0 == 0 and c1 >= self._usedColumnCount \
+                and r1 >= self._usedRowCount:
+            self._usedRowCount = min(self._usedRowCount, r0)
+        if r0 == 0 and r1 >= self._usedRowCount \
+                and c1 >= self._usedColumnCount:
+            self._usedColumnCount = min(self._usedColumnCount, c0)
+        if not self._usedRowCount or not self._usedColumnCount:
+            self._usedRowCount, self._usedColumnCount = 0, 0
+
+
+def _grid_size(data, freeze=None):
+    """Return the rows and columns of a grid holding a DataFrame with its
+    column names, and any frozen rows and columns.
+    """
+    frozen = freeze if isinstance(freeze, (list, tuple)) else (0, 0)
+    rows = max(data.shape[0] + 1, frozen[0] + 1)
+    cols = max(data.shape[1], frozen[1] + 1, 1)
+
+    return rows, cols
+
+
+def _render_options(typed=False):
+    """Return the values request options for typed or formatted reads."""
+    if not typed:
+        return {}
+
+    return {
+        'valueRenderOption': 'UNFORMATTED_VALUE',
+        'dateTimeRenderOption': 'SERIAL_NUMBER',
+    }
+
+
+def _typed(data, dates=None, dtypes=None):
+    """Build typed columns from unformatted values, converting the serial
+    numbers of the dates columns to datetimes. Columns in dtypes are cast
+    to the given dtype instead.
+    """
+    if dates is None:
+        dates = []
+    if dtypes is None:
+        dtypes = {}
+
+    # Columns are set by position, as their names may repeat
+    data = data.copy(deep=False)
+    names, data.columns = data.columns, range(data.shape[1])
+    for i, col in enumerate(names):
+        values = data[i]
+        values = values.where(values != '')
+
+        kind = pd.api.types.infer_dtype(values, skipna=True)
+        if col in dtypes:
+            values = _cast(values, dtypes[col])
+        elif col in dates:
+            values = pd.Series(
+                googleapi.serialize.from_serial(values), index=values.index)
+        elif kind == 'integer' and not values.hasnans:
+            values = values.astype('int64')
+        elif kind in ('integer', 'floating', 'mixed-integer-float'):
+            values = values.astype('float64')
+        elif kind == 'boolean':
+            values = values.astype('boolean')
+
+        data[i] = values
+
+    data.columns = names
+    return data
+
+
+def _infer(data, dtypes=None, sample=100):
+    """Convert the string columns of formatted values to numbers or
+    datetimes. The type of each column is decided from a sample of its
+    values and the whole column is then converted once, leaving the column
+    as it was if any value fails to convert. Columns in dtypes are cast to
+    the given dtype without inference. Empty cells become NaN or NaT.
+    """
+    if dtypes is None:
+        dtypes = {}
+
+    # Columns are set by position, as their names may repeat
+    data = data.copy(deep=False)
+    names, data.columns = data.columns, range(data.shape[1])
+    for i, col in enumerate(names):
+        values = data[i]
+        if col in dtypes:
+            data[i] = _cast(values, dtypes[col])
+            continue
+        if values.dtype != object:
+            continue
+
+        values = values.where(values.notna() & (values != ''))
+        present = values.notna()
+        head = values[present].head(sample)
+        if head.empty:
+            continue
+
+        number = _number(head)
+        if number.notna().all():
+            number = _number(values)
+            if number[present].notna().all():
+                data[i] = number
+            continue
+
+        if not pd.api.types.is_string_dtype(head):
+            continue
+        date = pd.to_datetime(head, errors='coerce')
+        if date.notna().all():
+            date = pd.to_datetime(
+                values, errors='coerce', infer_datetime_format=True)
+            if date[present].notna().all():
+                data[i] = date
+
+    data.columns = names
+    return data
+
+
+def _normalize(rows, width):
+    """Pad or truncate ragged rows of values into a 2-D object array in a
+    single pass. The API omits trailing empty cells, which become None.
+    """
+    # The compiled loop of pd.DataFrame for lists of rows, which copies
+    # full rows as they are and only pads the short ones
+    array = pd._libs.lib.to_object_array(rows, min_width=width)
+
+    return array[:, :width]
+
+
+def _compact(data, arrow=False, threshold=0.5):
+    """Reduce the memory of a DataFrame. String columns with a ratio of
+    distinct values below the threshold become categoricals, and the
+    others Arrow strings with arrow. Numeric columns are downcast to the
+    smallest nullable dtype that holds their values exactly.
+    """
+    if arrow:
+        # Raises ImportError without pyarrow
+        pd.api.types.pandas_dtype('string[pyarrow]')
+
+    # Columns are set by position, as their names may repeat
+    data = data.copy(deep=False)
+    names, data.columns = data.columns, range(data.shape[1])
+    for i in range(data.shape[1]):
+        values = data[i]
+        kind = values.dtype.kind
+
+        if kind == 'O':
+            if pd.api.types.infer_dtype(values, skipna=True) != 'string':
+                continue
+            if values.nunique() < threshold * len(values):
+                data[i] = values.astype('category')
+            elif arrow:
+                data[i] = values.astype('string[pyarrow]')
+        elif kind in 'iuf' and _integral(values):
+            values = pd.to_numeric(values.astype('Int64'), downcast='integer')
+            data[i] = values
+        elif kind == 'f':
+            small = values.astype('float32')
+            if ((small == values) | values.isna()).all():
+                values = small
+            data[i] = values.astype(values.dtype.name.capitalize())
+
+    data.columns = names
+    return data
+
+
+def _integral(values):
+    """Whether the values of a numeric column are whole numbers within the
+    range of int64.
+    """
+    values = values.dropna()
+    if values.empty:
+        return True
+    if values.min() < -2.0**63 or values.max() >= 2.0**63:
+        return False
+
+    return values.dtype.kind in 'iu' or not values.mod(1).any()
+
+
+def _number(values):
+    """Convert formatted numbers such as '$(1,000)' to numeric values. The
+    currency symbols and separators are only removed if needed.
+    """
+    number = pd.to_numeric(values, errors='coerce')
+    if number.isna().sum() > values.isna().sum():
+        if pd.api.types.infer_dtype(values, skipna=True) == 'string':
+            values = values.str.translate(_NUMBER_FORMAT)
+        number = pd.to_numeric(values, errors='coerce')
+
+    return number
+
+
+def _cast(values, dtype):
+    """Cast a column to the given dtype, coercing values that fail."""
+    dtype = pd.api.types.pandas_dtype(dtype)
+    if values.dtype == dtype:
+        return values
+
+    if dtype.kind in 'iuf':
+        values = _number(values.where(values != ''))
+        if dtype.kind in 'iu' and values.hasnans:
+            return values.astype('Int64')
+        return values.astype(dtype)
+    elif dtype.kind == 'M':
+        return pd.to_datetime(values, errors='coerce')
+    elif dtype.kind == 'b' and values.dtype == object:
+        values = values.map(
+            lambda v: v if not isinstance(v, str)
+            else {'TRUE': True, 'FALSE': False}.get(v.upper()))
+        return values.astype('boolean')
+
+    return values.astype(dtype)
+
 
 class DataRange():
     """ """
 
-    def __init__(self, response, data=None, sheetId=None):
+    __slots__ = (
+        '_spreadsheetId', '_range', '_data', '_sheetId', '_sheetTitle',
+        '_columns', '_startIndex', '_endIndex',
+    )
+
+    def __init__(
+        self, response, data=None, sheetId=None, typed=False, dates=None,
+        columns=None, dtypes=None, compact=False, infer=True
+    ):
+        """Wrap the values of a range. The types of the values are inferred
+        unless infer is False, in which case a DataFrame is used as it is,
+        without a copy.
+        """
         self._spreadsheetId = response.get('spreadsheetId')
 
-        rng = response.get('updatedRange', response.get('range')).split('!')
+        self._range = response.get('updatedRange', response.get('range'))
+        title, row, _, col, _ = googleapi.ranges.parse(self._range)
         if data is None:
             data = response.get('values')
 
         if isinstance(data, type(None)):
             raise ValueError('Data cannot be None')
         if not isinstance(data, pd.DataFrame):
+            header = [str(_).strip() for _ in data[0]]
             data = pd.DataFrame(
-                data[1:], columns=[_.strip() for _ in data[0]])
-
-        # Data Massage (May cause problems)
-        data = data.replace(
-            '[\$,)]', '', regex=True).replace('[(]', '-', regex=True)
-        for col in data.columns:
-            try:
-                data[col] = pd.to_numeric(data[col])
-                data[col].fillna(0, inplace=True)
-            except ValueError:
-                data[col] = pd.to_datetime(data[col], errors='ignore')
+                _normalize(data[1:], len(header)), columns=header)
+
+        if infer and typed:
+            data = _typed(data, dates, dtypes)
+        elif infer:
+            data = _infer(data, dtypes)
+
+        if compact:
+            data = _compact(data, arrow=compact == 'arrow')
 
         self._data = data
 
         self._sheetId = sheetId
         self._sheetTitle = None
         if self._sheetId is None:
-            self._sheetTitle = rng[0]
+            self._sheetTitle = title
+
+        ind = (row or 0, col or 0)
 
-        ind = rng[1].split(':')[0]
-        if not ind[-1].isdigit():
-            ind += '1'
-        ind = xl(ind)
+        # Grid column of each data column, when they are not contiguous
+        self._columns = columns
+        if columns is not None:
+            ind = (ind[0], min(columns))
 
         self._startIndex = ind
         self._endIndex = (
             ind[0] + self._data.shape[0],
             ind[1] + self._data.shape[1] - 1,
         )
+        if columns is not None:
+            self._endIndex = (self._endIndex[0], max(columns))
 
     @property
     def spreadsheetId(self):
@@ -552,6 +1777,26 @@ class DataRange():
         """ """
         return self._endIndex
 
+    @property
+    def startRowIndex(self):
+        """ """
+        return self._startIndex[0]
+
+    @property
+    def endRowIndex(self):
+        """ """
+        return self._endIndex[0] + 1
+
+    @property
+    def startColumnIndex(self):
+        """ """
+        return self._startIndex[1]
+
+    @property
+    def endColumnIndex(self):
+        """ """
+        return self._endIndex[1] + 1
+
     @property
     def data(self):
         """ """
@@ -559,7 +1804,11 @@ class DataRange():
 
     def get_loc(self, name):
         """ """
-        return self._data.columns.get_loc(name)
+        loc = self._data.columns.get_loc(name)
+        if self._columns is not None:
+            loc = self._columns[loc] - self._startIndex[1]
+
+        return loc
 
     def __repr__(self):
         return str(self._data)